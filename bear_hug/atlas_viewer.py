@@ -1,7 +1,6 @@
 #! /usr/bin/env python3.6
 
 from bear_hug import BearTerminal, BearLoop
-from bear_utilities import copy_shape
 from event import BearEventDispatcher
 from widgets import InputScrollable, ClosingListener, Layout,\
     Label, Widget, FPSCounter
@@ -35,52 +34,69 @@ class ElementBox(Layout):
         :param height:
         :return:
         """
-        chars = []
-        chars.append(['#' for x in range(width+2)])
-        for y in range(height):
-            chars.append(['#'] + [' ' for x in range(width)] + ['#'])
-        chars.append(['#' for x in range(width+2)])
-        colors = copy_shape(chars, color)
+        # Every row is a separate list, as the Layout will blit into them
+        chars = [['#'] * (width + 2)]
+        chars.extend(['#'] + [' '] * width + ['#'] for y in range(height))
+        chars.append(['#'] * (width + 2))
+        colors = [[color] * (width + 2) for y in range(height + 2)]
         return chars, colors
 
-    
-t = BearTerminal(size='46x52', title='Atlas',
-                 filter=['keyboard', 'mouse'])
-dispatcher = BearEventDispatcher()
-loop = BearLoop(t, dispatcher)
-dispatcher.register_listener(ClosingListener(), ['misc_input', 'tick'])
-t.start()
+
+def pack_boxes(sizes, max_width):
+    """
+    Place boxes in rows, left to right, starting a new row whenever the next
+    box would cross ``max_width``.
+
+    :param sizes: a list of (width, height) tuples
+
+    :param max_width: the width boxes should fit in
+
+    :return: a list of (x, y) positions and the total height of the rows
+    """
+    positions = []
+    x = 1
+    y = 1
+    y_step = 0
+    for width, height in sizes:
+        if x + width > max_width:
+            y += y_step
+            x = 1
+            y_step = 0
+        positions.append((x, y))
+        x += width + 1
+        if height + 1 >= y_step:
+            y_step = height + 1
+    return positions, y + y_step
+
+
+def main():
+    t = BearTerminal(size='46x52', title='Atlas',
+                     filter=['keyboard', 'mouse'])
+    dispatcher = BearEventDispatcher()
+    loop = BearLoop(t, dispatcher)
+    dispatcher.register_listener(ClosingListener(), ['misc_input', 'tick'])
+    t.start()
+
+    atlas = Atlas(XpLoader(os.path.dirname(__file__) +
+                           '/demo_assets/test_atlas.xp'),
+                  os.path.dirname(__file__)+'/demo_assets/test_atlas.json')
+    elements = [ElementBox(Widget(*atlas.get_element(element)), name=element)
+                for element in sorted(atlas.elements.keys())]
+    positions, packed_height = pack_boxes([w.size for w in elements], 45)
+    view_height = packed_height if packed_height > 50 else 50
+    chars = [[' '] * 45 for _ in range(view_height)]
+    colors = [['white'] * 45 for _ in range(view_height)]
+    element_view = InputScrollable(chars, colors, view_pos=(0, 0),
+                                   view_size=(45, 50), right_bar=True)
+    for index, widget in enumerate(elements):
+        element_view.add_child(widget, positions[index])
+    dispatcher.register_listener(element_view, ['tick', 'key_down', 'service'])
+    dispatcher.register_listener(element_view.scrollable,
+                                 ['tick', 'service'])
+    t.add_widget(element_view, pos=(0, 0))
+    t.add_widget(FPSCounter(), pos=(0, 51))
+    loop.run()
 
 
-atlas = Atlas(XpLoader(os.path.dirname(__file__)+'/demo_assets/test_atlas.xp'),
-              os.path.dirname(__file__)+'/demo_assets/test_atlas.json')
-elements = []
-positions = []
-names = []
-x = 1
-y = 1
-y_step = 0
-for element in sorted(atlas.elements.keys()):
-    w = ElementBox(Widget(*atlas.get_element(element)), name=element)
-    elements.append(w)
-    if x + w.width > 45:
-        y += y_step
-        x = 1
-        y_step = 0
-    positions.append((x, y))
-    x += w.width + 1
-    if w.height + 1 >= y_step:
-        y_step = w.height + 1
-view_height = y+y_step if y+y_step > 50 else 50
-chars = [[' ' for _ in range(45)] for _ in range(view_height)]
-colors = copy_shape(chars, 'white')
-element_view = InputScrollable(chars, colors, view_pos=(0, 0),
-                               view_size=(45, 50), right_bar=True)
-for index, widget in enumerate(elements):
-    element_view.add_child(widget, positions[index])
-dispatcher.register_listener(element_view, ['tick', 'key_down', 'service'])
-dispatcher.register_listener(element_view.scrollable,
-                             ['tick', 'service'])
-t.add_widget(element_view, pos=(0, 0))
-t.add_widget(FPSCounter(), pos=(0, 51))
-loop.run()
+if __name__ == '__main__':
+    main()
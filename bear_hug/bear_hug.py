@@ -10,11 +10,12 @@ except RuntimeError:
     # DLLs are not available
     from bearlibterminal import terminal
 from bear_hug.bear_utilities import BearException,\
-    BearLoopException
+    BearLoopException, color_runs
 from bear_hug.event import BearEvent
 
 import time
-from copy import copy
+from bisect import insort
+from itertools import groupby
 from collections import namedtuple
 
 
@@ -88,32 +89,7 @@ class BearTerminal:
     # The same buttons going up.
     # BLT OR's key code with TK_KEY_RELEASED, which is not reversible except by
     # bruteforcing all the keys. Thus, a second dict.
-    _up_codes = {260: 'TK_A', 261: 'TK_B', 262: 'TK_C', 263: 'TK_D', 264: 'TK_E',
-                 265: 'TK_F', 266: 'TK_G', 267: 'TK_H', 268: 'TK_I', 269: 'TK_J',
-                 270: 'TK_K', 271: 'TK_L', 272: 'TK_M', 273: 'TK_N', 274: 'TK_O',
-                 275: 'TK_P', 276: 'TK_Q', 277: 'TK_R', 278: 'TK_S', 279: 'TK_T',
-                 280: 'TK_U', 281: 'TK_V', 282: 'TK_W', 283: 'TK_X', 284: 'TK_Y',
-                 285: 'TK_Z', 286: 'TK_1', 287: 'TK_2', 288: 'TK_3', 289: 'TK_4',
-                 290: 'TK_5', 291: 'TK_6', 292: 'TK_7', 293: 'TK_8', 294: 'TK_9',
-                 295: 'TK_0', 296: 'TK_ENTER', 297: 'TK_ESCAPE',
-                 298: 'TK_BACKSPACE', 299: 'TK_TAB', 300: 'TK_SPACE',
-                 301: 'TK_MINUS', 302: 'TK_EQUALS', 303: 'TK_LBRACKET',
-                 304: 'TK_RBRACKET', 305: 'TK_BACKSLASH', 307: 'TK_SEMICOLON',
-                 308: 'TK_APOSTROPHE', 309: 'TK_GRAVE', 310: 'TK_COMMA',
-                 311: 'TK_PERIOD', 312: 'TK_SLASH', 314: 'TK_F1', 315: 'TK_F2',
-                 316: 'TK_F3', 317: 'TK_F4', 318: 'TK_F5', 319: 'TK_F6',
-                 320: 'TK_F7', 321: 'TK_F8', 322: 'TK_F9', 323: 'TK_F10',
-                 324: 'TK_F11', 325: 'TK_F12', 328: 'TK_PAUSE', 329: 'TK_INSERT',
-                 30: 'TK_HOME', 331: 'TK_PAGEUP', 332: 'TK_DELETE',
-                 333: 'TK_END', 334: 'TK_PAGEDOWN', 335: 'TK_RIGHT',
-                 336: 'TK_LEFT', 337: 'TK_DOWN', 338: 'TK_UP',
-                 340: 'TK_KP_DIVIDE', 341: 'TK_KP_MULTIPLY', 342: 'TK_KP_MINUS',
-                 343: 'TK_KP_PLUS', 344: 'TK_KP_ENTER', 345: 'TK_KP_1',
-                 346: 'TK_KP_2', 347: 'TK_KP_3', 348: 'TK_KP_4', 349: 'TK_KP_5',
-                 350: 'TK_KP_6', 351: 'TK_KP_7', 352: 'TK_KP_8', 353: 'TK_KP_9',
-                 354: 'TK_KP_0', 355: 'TK_KP_PERIOD', 368: 'TK_SHIFT',
-                 369: 'TK_CONTROL', 370: 'TK_ALT', 384: 'TK_MOUSE_LEFT',
-                 385: 'TK_MOUSE_RIGHT', 386: 'TK_MOUSE_MIDDLE'}
+    _up_codes = {code | 0x100: name for code, name in _down_codes.items()}
     
     # This is misc input and state codes
     misc_input = {0x83: 'TK_MOUSE_X1', 0x84: 'TK_MOUSE_X2',
@@ -126,67 +102,86 @@ class BearTerminal:
     0xC6: 'TK_LAYER', 0xC7: 'TK_COMPOSITION', 0xC8: 'TK_CHAR',
     0xC9: 'TK_WCHAR', 0xCA: 'TK_EVENT', 0xCB: 'TK_FULLSCREEN',
                    0xE0: 'TK_CLOSE', 0xE1: 'TK_RESIZED'}
+
+    # All input codes in a single list indexed by code, so that check_input
+    # can look up every event with a single subscription. Items are
+    # prebuilt BearEvents or None for unknown codes
+    _input_codes = [None] * (max(*_down_codes, *_up_codes, *misc_input) + 1)
+    for code, name in _up_codes.items():
+        _input_codes[code] = BearEvent('key_up', name)
+    for code, name in _down_codes.items():
+        _input_codes[code] = BearEvent('key_down', name)
+    for code, name in misc_input.items():
+        _input_codes[code] = BearEvent('misc_input', name)
+    del code, name
+    # key_down events emitted every tick for the keys in currently_pressed
+    _key_down_events = {event.event_value: event for event in _input_codes
+                        if event and event.event_type == 'key_down'}
     
     # This is the name-to-number mapping, as in bearlibterminal/terminal.py
     # The purpose of this dict is, again, to let bear_hug users work with strs
-    # and avoid thinking about constants
-    _state_constants = {'TK_BACKSLASH': 49, 'TK_KP_1': 89,
-        'TK_KEY_RELEASED': 256, 'TK_Q': 20, 'TK_4': 33, 'TK_N': 17,
-        'TK_ALIGN_TOP': 4, 'TK_RESIZED': 225, 'TK_ALIGN_RIGHT': 2,
-        'TK_H': 11, 'TK_MOUSE_MIDDLE': 130, 'TK_CELL_WIDTH': 194, 'TK_3': 32,
-        'TK_F10': 67, 'TK_RIGHT': 79, 'TK_ESCAPE': 41, 'TK_KP_6': 94,
-        'TK_COMMA': 54, 'TK_GRAVE': 53, 'TK_PERIOD': 55, 'TK_MOUSE_CLICKS': 140,
-        'TK_KP_3': 91, 'TK_MOUSE_MOVE': 133, 'TK_KP_2': 90,
-        'TK_INPUT_CANCELLED': -1, 'TK_EVENT': 202, 'TK_KP_0': 98,
-                        'TK_DELETE': 76, 'TK_DOWN': 81, 'TK_CLOSE': 224, 'TK_R': 21,
-                        'TK_F9': 66, 'TK_M': 16, 'TK_ALIGN_MIDDLE': 12, 'TK_1': 30, 'TK_5': 34,
-                        'TK_WIDTH': 192, 'TK_F': 9, 'TK_G': 10, 'TK_SLASH': 56,
-                        'TK_PAGEDOWN': 78, 'TK_MOUSE_X2': 132, 'TK_KP_PLUS': 87,
-                        'TK_MOUSE_X1': 131, 'TK_HOME': 74, 'TK_W': 26, 'TK_F1': 58,
-                        'TK_MOUSE_X': 135, 'TK_ALIGN_LEFT': 1, 'TK_ALIGN_BOTTOM': 8,
-                        'TK_FULLSCREEN': 203, 'TK_C': 6, 'TK_CONTROL': 113,
-                        'TK_MOUSE_PIXEL_Y': 138, 'TK_COLOR': 196, 'TK_PAGEUP': 75,
-                        'TK_RBRACKET': 48, 'TK_F11': 68, 'TK_MOUSE_SCROLL': 134,
-                        'TK_KP_MULTIPLY': 85, 'TK_F8': 65, 'TK_MINUS': 45, 'TK_ENTER': 40,
-                        'TK_ALT': 114, 'TK_O': 18, 'TK_Z': 29, 'TK_COMPOSITION': 199,
-                        'TK_F2': 59, 'TK_T': 23, 'TK_EQUALS': 46, 'TK_ALIGN_CENTER': 3,
-                        'TK_Y': 28, 'TK_BACKSPACE': 42, 'TK_SHIFT': 112, 'TK_S': 22,
-                        'TK_SPACE': 44, 'TK_MOUSE_RIGHT': 129, 'TK_KP_5': 93, 'TK_KP_ENTER': 88,
-                        'TK_9': 38, 'TK_MOUSE_Y': 136, 'TK_6': 35, 'TK_UP': 82,
-                        'TK_BKCOLOR': 197, 'TK_2': 31, 'TK_KP_4': 92, 'TK_MOUSE_LEFT': 128,
-                        'TK_F7': 64, 'TK_HEIGHT': 193, 'TK_X': 27, 'TK_V': 25, 'TK_P': 19,
-                        'TK_D': 7, 'TK_KP_9': 97, 'TK_PAUSE': 72, 'TK_F6': 63, 'TK_WCHAR': 201,
-                        'TK_U': 24, 'TK_KP_7': 95, 'TK_APOSTROPHE': 52, 'TK_F5': 62,
-                        'TK_LBRACKET': 47, 'TK_7': 36, 'TK_8': 37, 'TK_TAB': 43, 'TK_0': 39,
-                        'TK_MOUSE_PIXEL_X': 137, 'TK_CHAR': 200, 'TK_KP_DIVIDE': 84,
-                        'TK_LAYER': 198, 'TK_KP_8': 96, 'TK_B': 5, 'TK_ALIGN_DEFAULT': 0,
-                        'TK_K': 14, 'TK_KP_MINUS': 86, 'TK_LEFT': 80, 'TK_CELL_HEIGHT': 195,
-                        'TK_SEMICOLON': 51, 'TK_INSERT': 73, 'TK_END': 77, 'TK_F12': 69,
-                        'TK_MOUSE_WHEEL': 139, 'TK_F3': 60, 'TK_L': 15, 'TK_KP_PERIOD': 99,
-                        'TK_J': 13, 'TK_F4': 61}
+    # and avoid thinking about constants. Key, mouse and misc state codes are
+    # the same as their input codes, so only the rest is listed here
+    _state_constants = {'TK_KEY_RELEASED': 256, 'TK_INPUT_CANCELLED': -1,
+                        'TK_ALIGN_DEFAULT': 0, 'TK_ALIGN_LEFT': 1,
+                        'TK_ALIGN_RIGHT': 2, 'TK_ALIGN_CENTER': 3,
+                        'TK_ALIGN_TOP': 4, 'TK_ALIGN_BOTTOM': 8,
+                        'TK_ALIGN_MIDDLE': 12}
+    _state_constants.update({name: code
+                             for code, name in _down_codes.items()})
+    _state_constants.update({name: code for code, name in misc_input.items()})
     
     def __init__(self, font_path='../demo_assets/cp437_12x12.png',
                  **kwargs):
         if kwargs:
-            if any(x not in self._accepted_kwargs for x in kwargs.keys()):
+            if kwargs.keys() - self._accepted_kwargs.keys():
                 raise BearException('Only bearlibterminal library settings '
                                     +' accepted as kwargs for BearTerminal')
-            self.outstring = ';'.join('{}.{}={}'.format(self._accepted_kwargs[x],
-                                                        x, str(kwargs[x]))
-                                 for x in kwargs)+';'
+            self.outstring = ';'.join([f'{self._accepted_kwargs[x]}.{x}={value}'
+                                       for x, value in kwargs.items()]) + ';'
         else:
             self.outstring = None
+        # With postformatting on (BLT default), square brackets in printed
+        # strings are parsed as markup and need to be escaped
+        self._postformatting = str(kwargs.get('postformatting',
+                                              True)).lower() != 'false'
         self.widget_locations = {}
-        #  This will be one list of drawable pointers per layer. Lists are
-        #  not actually allocated until at least one Widget is added to layer
-        #  Lists are created when adding the first Widget and are never
-        #  destroyed or resized.
-        self._widget_pointers = [None for x in range(256)]
+        #  This will be one grid of widget pointers per layer, stored as a
+        #  flat list of rows and indexed as [y * width + x]. Grids are not
+        #  actually allocated until at least one Widget is added to layer. They
+        #  are created when adding the first Widget and are never resized. They
+        #  are only destroyed when the terminal is cleared.
+        self._widget_pointers = {}
+        #  Layers that currently have any widgets, in ascending order, and
+        #  widget counts for every layer
+        self._active_layers = []
+        self._layer_counts = {}
+        #  Screen buffers. Like the pointers, these are grids of rows, one per
+        #  layer, allocated together with pointers. Back buffers get whatever
+        #  is drawn by *_widget methods, front ones store the chars and colors
+        #  that were actually sent to bearlibterminal.
+        self._back_chars = {}
+        self._back_colors = {}
+        self._front_chars = {}
+        self._front_colors = {}
+        #  Rows that were changed in back buffers since the last refresh
+        self._dirty_rows = {}
         self.default_color = 'white'
+        # Whether bearlibterminal needs to refresh the window
+        self.needs_refresh = False
+        # The color last set in bearlibterminal, to avoid setting it again
+        self._current_color = None
+        # Color names resolved to ints. Bearlibterminal parses names on every
+        # terminal.color() call, which is an extra library call each time
+        self._color_values = {}
+        # Window size, known after the terminal is started
+        self._size = None
         # TODO: make font_path system independent via os.path
         self.font_path = font_path
         # Buttons currently pressed (see check_input docstring)
         self.currently_pressed = set()
+        # key_down events for these buttons, rebuilt whenever the set changes
+        self._pressed_events = []
 
     #  Methods that replicate or wrap around blt's functions
 
@@ -202,24 +197,45 @@ class BearTerminal:
             'font: {}, size=12x12, codepage=437'.format(self.font_path))
         if self.outstring:
             terminal.set(self.outstring)
-        self.refresh()
+        self._current_color = None
+        # Window size in chars. It doesn't change after the terminal is opened
+        self._size = tuple(int(x) for x in
+                           terminal.get('window.size').split('x'))
+        terminal.refresh()
+        self.needs_refresh = False
         
     def clear(self):
         """
         Remove all widgets from this terminal, but do not close it.
         """
-        drawables = copy(self.widget_locations)
-        for drawable in drawables:
-            self.remove_widget(drawable, refresh=False)
+        # A single terminal.clear() instead of clearing every widget's area
+        terminal.clear()
+        for widget in self.widget_locations:
+            widget.terminal = None
+            widget.parent = None
+        self.widget_locations.clear()
+        self._widget_pointers.clear()
+        self._active_layers.clear()
+        self._layer_counts.clear()
+        for buffer in (self._back_chars, self._back_colors,
+                       self._front_chars, self._front_colors,
+                       self._dirty_rows):
+            buffer.clear()
+        self._current_color = None
+        self.needs_refresh = True
         self.refresh()
 
     def refresh(self):
         """
         Refresh a terminal.
 
-        Actually draws whatever changes were made by ``*_widget`` methods.
+        Actually draws whatever changes were made by ``*_widget`` methods. If
+        nothing has changed since the last refresh, does nothing.
         """
-        terminal.refresh()
+        self._draw_changes()
+        if self.needs_refresh:
+            terminal.refresh()
+            self.needs_refresh = False
 
     def close(self):
         """
@@ -253,6 +269,7 @@ class BearTerminal:
             #         self.font_path))
             # terminal.set("window.cellsize:auto; window.fullscreen=false")
              terminal.set('window.fullscreen=false')
+        self.needs_refresh = True
     #  Drawing and removing stuff
 
     def add_widget(self, widget,
@@ -273,20 +290,15 @@ class BearTerminal:
         """
         if widget in self.widget_locations.keys():
             raise BearException('Cannot add the same widget twice')
-        for y in range(widget.height):
-            for x in range(widget.width):
-                if self._widget_pointers[layer] and \
-                        self._widget_pointers[layer][pos[0] + x][pos[1] + y]:
-                    raise BearException('Widgets cannot collide within a layer')
+        self._check_position(widget, pos, layer)
         widget.terminal = self
         widget.parent = self
         self.widget_locations[widget] = WidgetLocation(pos=pos, layer=layer)
-        terminal.layer(layer)
-        if not self._widget_pointers[layer]:
-            size = terminal.get('window.size')
-            width, height = (int(x) for x in size.split('x'))
-            self._widget_pointers[layer] = [[None for y in range(height)]
-                                            for x in range(width)]
+        if layer not in self._widget_pointers:
+            self._create_layer(layer)
+        self._layer_counts[layer] = self._layer_counts.get(layer, 0) + 1
+        if self._layer_counts[layer] == 1:
+            insort(self._active_layers, layer)
         self.update_widget(widget, refresh)
     
     def remove_widget(self, widget, refresh=False):
@@ -300,18 +312,17 @@ class BearTerminal:
 
         :param refresh: whether to refresh the terminal after removing a widget. If False, the widget will be visible until the next ``terminal.refresh()`` call
         """
-        corner = self.widget_locations[widget].pos
-        terminal.layer(self.widget_locations[widget].layer)
-        terminal.clear_area(*corner, widget.width, widget.height)
-        for y in range(len(widget.chars)):
-            for x in range(len(widget.chars[0])):
-                self._widget_pointers[self.widget_locations[widget].layer]\
-                    [corner[0] + x][corner[1] + y] = None
-        if refresh:
-            self.refresh()
-        del(self.widget_locations[widget])
+        corner, layer = self.widget_locations.pop(widget)
+        size = widget.size
+        self._clear_cells(layer, corner, size)
+        self._set_pointers(layer, corner, size, None)
+        self._layer_counts[layer] -= 1
+        if not self._layer_counts[layer]:
+            self._active_layers.remove(layer)
         widget.terminal = None
         widget.parent = None
+        if refresh:
+            self.refresh()
         
     def move_widget(self, widget, pos, refresh=False):
         """
@@ -324,11 +335,16 @@ class BearTerminal:
 
         :param pos: :param refresh: whether to refresh the terminal after removing a widget. If False, the widget won't move on screen until the next ``terminal.refresh()`` call
         """
-        layer = self.widget_locations[widget].layer
-        self.remove_widget(widget)
-        self.add_widget(widget, pos=pos, layer=layer)
-        if refresh:
-            self.refresh()
+        old_pos, layer = self.widget_locations[widget]
+        self._check_position(widget, pos, layer)
+        # Clearing the old area and drawing the widget anew, without removing
+        # and re-adding it to the terminal. Cells that end up the same are not
+        # redrawn at all.
+        size = widget.size
+        self._clear_cells(layer, old_pos, size)
+        self._set_pointers(layer, old_pos, size, None)
+        self.widget_locations[widget] = WidgetLocation(pos=pos, layer=layer)
+        self.update_widget(widget, refresh)
 
     def update_widget(self, widget, refresh=False):
         """
@@ -338,28 +354,178 @@ class BearTerminal:
         make these changes visible. It is also called by ``self.add_widget()``
         and other methods that have a ``refresh`` argument.
 
+        Widgets are drawn to an off-screen buffer. During the refresh, it is
+        compared to what was drawn before, and only changed cells are sent to
+        bearlibterminal.
+
         :param widget: A widget to be updated.
         """
         if widget not in self.widget_locations:
             raise BearException('Cannot update non-added Widgets')
-        pos = self.widget_locations[widget].pos
-        layer = self.widget_locations[widget].layer
-        terminal.layer(layer)
-        #terminal.clear_area(*self.widget_locations[widget].pos, widget.width, widget.height)
-        running_color = self.default_color
-        for y in range(widget.height):
-            for x in range(widget.width):
-                # Widget can have None as color for its empty cells
-                if widget.colors[y][x] and widget.colors[y][x] != running_color:
-                    running_color = widget.colors[y][x]
-                    terminal.color(running_color)
-                terminal.put(pos[0] + x, pos[1] + y, widget.chars[y][x])
-                self._widget_pointers[layer][pos[0] + x][pos[1] + y] = widget
-        if running_color != self.default_color:
-            terminal.color(self.default_color)
+        pos, layer = self.widget_locations[widget]
+        size = widget.size
+        if pos[0] + size[0] > self._size[0] or pos[1] + size[1] > self._size[1]:
+            raise BearException('Widget does not fit in the terminal')
+        chars_buffer = self._back_chars[layer]
+        colors_buffer = self._back_colors[layer]
+        for x, y, color, chars in color_runs(widget.chars, widget.colors,
+                                             self.default_color):
+            start = pos[0] + x
+            end = start + len(chars)
+            chars_buffer[pos[1] + y][start:end] = chars
+            colors_buffer[pos[1] + y][start:end] = [color] * len(chars)
+        self._dirty_rows[layer].update(range(pos[1], pos[1] + size[1]))
+        self._set_pointers(layer, pos, size, widget)
         if refresh:
             self.refresh()
+
+    def _create_layer(self, layer):
+        """
+        Allocate pointer grid and screen buffers for a new layer.
+        """
+        width, height = self._size
+        self._widget_pointers[layer] = [None] * (width * height)
+        # What is drawn on the layer (front) and what should be (back). Empty
+        # cells are None in both chars and colors
+        self._front_chars[layer] = [[None] * width for y in range(height)]
+        self._front_colors[layer] = [[None] * width for y in range(height)]
+        self._back_chars[layer] = [[None] * width for y in range(height)]
+        self._back_colors[layer] = [[None] * width for y in range(height)]
+        self._dirty_rows[layer] = set()
+
+    def _check_position(self, widget, pos, layer):
+        """
+        Raise BearException if widget at pos would not fit in the terminal or
+        would collide with any other widget on a layer.
+        """
+        size = widget.size
+        if pos[0] < 0 or pos[1] < 0 or pos[0] + size[0] > self._size[0] \
+                or pos[1] + size[1] > self._size[1]:
+            raise BearException('Widget does not fit in the terminal')
+        if layer not in self._widget_pointers:
+            return
+        # Every row of the widget's rectangle is checked with a single slice.
+        # The widget itself is not a collision, in case it's being moved
+        grid = self._widget_pointers[layer]
+        width = self._size[0]
+        start = pos[1] * width + pos[0]
+        for row_start in range(start, start + size[1] * width, width):
+            row = grid[row_start:row_start + size[0]]
+            if row.count(None) + row.count(widget) != size[0]:
+                raise BearException('Widgets cannot collide within a layer')
+
+    def _set_pointers(self, layer, pos, size, value):
+        """
+        Set all pointers within a rectangle on a layer to value.
+        """
+        grid = self._widget_pointers[layer]
+        pointers = [value] * size[0]
+        width = self._size[0]
+        start = pos[1] * width + pos[0]
+        for row_start in range(start, start + size[1] * width, width):
+            grid[row_start:row_start + size[0]] = pointers
+
+    def _clear_cells(self, layer, pos, size):
+        """
+        Mark a rectangle on a layer as empty in the screen buffer.
+        """
+        right = pos[0] + size[0]
+        empty = [None] * size[0]
+        for y in range(pos[1], pos[1] + size[1]):
+            self._back_chars[layer][y][pos[0]:right] = empty
+            self._back_colors[layer][y][pos[0]:right] = empty
+        self._dirty_rows[layer].update(range(pos[1], pos[1] + size[1]))
+
+    def _draw_changes(self):
+        """
+        Send to bearlibterminal every cell that differs between the screen
+        buffer and what is currently drawn.
+        """
+        for layer, dirty_rows in self._dirty_rows.items():
+            if not dirty_rows:
+                continue
+            back_chars = self._back_chars[layer]
+            back_colors = self._back_colors[layer]
+            front_chars = self._front_chars[layer]
+            front_colors = self._front_colors[layer]
+            # Consecutive cells of the same color are printed as a single
+            # string. It saves a lot of FFI calls compared to putting every char
+            # separately. Runs never overlap, so they are grouped by color to
+            # set every color only once, starting with the one already set.
+            runs_by_color = {}
+            cleared = []
+            for y in dirty_rows:
+                chars = back_chars[y]
+                colors = back_colors[y]
+                if chars == front_chars[y] and colors == front_colors[y]:
+                    continue
+                # Only the span between the first and the last changed cells
+                # is redrawn
+                old_chars = front_chars[y]
+                old_colors = front_colors[y]
+                start = 0
+                while chars[start] == old_chars[start] \
+                        and colors[start] == old_colors[start]:
+                    start += 1
+                end = len(chars)
+                while chars[end - 1] == old_chars[end - 1] \
+                        and colors[end - 1] == old_colors[end - 1]:
+                    end -= 1
+                # Empty cells have None for both char and color, so the span
+                # is split into runs by color alone
+                x = start
+                for color, run in groupby(colors[start:end]):
+                    run_end = x + len(list(run))
+                    if color is None:
+                        cleared.append((x, y, run_end - x))
+                    else:
+                        runs_by_color.setdefault(color, []).append(
+                            (x, y, chars[x:run_end]))
+                    x = run_end
+                old_chars[start:end] = chars[start:end]
+                old_colors[start:end] = colors[start:end]
+            dirty_rows.clear()
+            if not cleared and not runs_by_color:
+                continue
+            terminal.layer(layer)
+            for x, y, width in cleared:
+                terminal.clear_area(x, y, width, 1)
+            for x, y, chars in runs_by_color.pop(self._current_color, ()):
+                self._print_run(x, y, chars)
+            for color, runs in runs_by_color.items():
+                self._current_color = color
+                terminal.color(self._color_value(color))
+                for x, y, chars in runs:
+                    self._print_run(x, y, chars)
+            self.needs_refresh = True
     
+    def _color_value(self, color):
+        """
+        Return the color as accepted by ``terminal.color()``, with color names
+        converted to ints once per name.
+        """
+        if not isinstance(color, str):
+            return color
+        try:
+            return self._color_values[color]
+        except KeyError:
+            value = terminal.color_from_name(color)
+            self._color_values[color] = value
+            return value
+
+    def _print_run(self, x, y, chars):
+        """
+        Print a sequence of chars as a single string starting at (x, y)
+        """
+        try:
+            line = ''.join(chars)
+        except TypeError:
+            # Some chars are given as int codes
+            line = ''.join(c if isinstance(c, str) else chr(c) for c in chars)
+        if self._postformatting:
+            line = line.replace('[', '[[').replace(']', ']]')
+        terminal.print(x, y, line)
+
     #  Getting terminal info
 
     def get_widget_by_pos(self, pos, layer=None):
@@ -370,12 +536,14 @@ class BearTerminal:
 
         :param layer: A layer to look at. If this is set to valid layer number, returns the widget (if any) from that layer. If not set, return the widget from highest layer where a given cell is non-empty.
         """
+        index = pos[1] * self._size[0] + pos[0]
         if layer:
-            return self._widget_pointers[layer][pos[0]][pos[1]]
+            return self._widget_pointers[layer][index]
         else:
-            for layer_list in reversed(self._widget_pointers):
-                if layer_list and layer_list[pos[0]][pos[1]]:
-                    return layer_list[pos[0]][pos[1]]
+            for layer in reversed(self._active_layers):
+                widget = self._widget_pointers[layer][index]
+                if widget:
+                    return widget
             return None
         
     # Input
@@ -401,38 +569,60 @@ class BearTerminal:
         ``key_down`` events immediately after the button is pressed and expects
         widgets and listeners to mind their input cooldowns themselves.
 
+        Input events are created once per input code and reused, so listeners
+        should not modify them.
+
         :yields: BearEvent instances with ``event_type`` set to ``misc_input``, ``key_up`` or ``key_down``.
         """
-        while terminal.has_input():
+        # Local names save attribute lookups for every event
+        has_input = terminal.has_input
+        read = terminal.read
+        input_codes = self._input_codes
+        currently_pressed = self.currently_pressed
+        pressed_changed = False
+        while has_input():
             # Process the input event
-            in_event = terminal.read()
-            if in_event in self.misc_input:
-                yield BearEvent('misc_input', self.misc_input[in_event])
-            elif in_event in self._down_codes:
-                self.currently_pressed.add(self._down_codes[in_event])
-            elif in_event in self._up_codes:
-                try:
-                    self.currently_pressed.remove(self._up_codes[in_event])
-                except KeyError:
-                    # It's possible that the button was pressed before launching
-                    # the bear_hug app, and released now. Then it obviously
-                    # couldn't be in self.currently_pressed, causing exception
-                    pass
-                yield BearEvent('key_up', self._up_codes[in_event])
-            else:
+            in_event = read()
+            try:
+                event = input_codes[in_event]
+            except IndexError:
+                event = None
+            if event is None:
                 raise BearException('Unknown input code {}'.format(in_event))
-        for key in self.currently_pressed:
-            yield BearEvent('key_down', key)
+            if event.event_type == 'key_down':
+                # Held keys are repeated by BLT, these don't change anything
+                if event.event_value not in currently_pressed:
+                    currently_pressed.add(event.event_value)
+                    pressed_changed = True
+                continue
+            if event.event_type == 'key_up':
+                # It's possible that the button was pressed before launching
+                # the bear_hug app, and released now. Then it obviously
+                # couldn't be in self.currently_pressed
+                if event.event_value in currently_pressed:
+                    currently_pressed.remove(event.event_value)
+                    pressed_changed = True
+            yield event
+        if pressed_changed or \
+                len(self._pressed_events) != len(currently_pressed):
+            key_down_events = self._key_down_events
+            self._pressed_events = [key_down_events[key]
+                                    for key in currently_pressed]
+        yield from self._pressed_events
     
     def check_state(self, query):
         """
         Wrap BLT `state <http://foo.wyrd.name/en:bearlibterminal:reference#state>`_
 
         Accepts any of the ``TK_*`` strings and returns whatever ``terminal.state`` has
-        to say about it.
+        to say about it. Integer state codes are passed to ``terminal.state``
+        as is, so that code polling the state every tick can resolve the name
+        once and skip the lookup.
 
-        :param query: query string
+        :param query: query string or integer state code
         """
+        if isinstance(query, int):
+            return terminal.state(query)
         return terminal.state(self._state_constants[query])
 
 
@@ -488,22 +678,31 @@ class BearLoop:
 
         It would run until stopped with ``self.stop()``
         """
+        # Local names save attribute lookups every frame
+        clock = time.perf_counter
+        sleep = time.sleep
         # An imaginary "zeroth" tick to give the first tick correct timing
-        self.last_time = time.time() - self.frame_time
+        self.last_time = clock() - self.frame_time
+        # The moment when the current tick should start
+        deadline = self.last_time + self.frame_time
         while not self.stopped:
             # All actual processes happen here
             # Sends time since last tick *started*
-            t = time.time() - self.last_time
-            self.last_time = time.time()
+            now = clock()
+            t = now - self.last_time
+            self.last_time = now
             self._run_iteration(t)
-            sleep_time = self.frame_time - time.time() + self.last_time
-            if sleep_time > 0.05*self.frame_time:
+            deadline += self.frame_time
+            # Sleep time is calculated once, so it can't become negative
+            # between the check and the `sleep` call
+            sleep_time = deadline - clock()
+            if sleep_time > 0:
                 # If frame was finished early, wait for it
-                # But only if there is enough spare time to make it worthwhile.
-                # Otherwise, on a laggy system sleep_time may be positive when
-                # the `if` check runs, but negative by the time `sleep` is
-                # called, causing a crash.
-                time.sleep(self.frame_time - time.time() + self.last_time)
+                sleep(sleep_time)
+            else:
+                # Lagging behind. Start counting from now instead of running a
+                # burst of ticks to catch up with the schedule.
+                deadline = clock()
         # When the loop stops, it closes the terminal. Everyone is expected to
         # have caught the shutdown service event
         self.terminal.close()
@@ -4,8 +4,6 @@ A collection of random stuff for bear_hug that wouldn't fit into other submodule
 Includes a series of useful functions and all bear_hug exception classes.
 """
 
-from copy import deepcopy
-
 
 def shapes_equal(a, b):
     """
@@ -19,9 +17,12 @@ def shapes_equal(a, b):
     """
     if len(a) != len(b):
         return False
-    if any(isinstance(x, list) and isinstance(y, list) and len(x) != len(y)
-           for x, y in zip(a, b)):
-        return False
+    for x, y in zip(a, b):
+        x_is_list = isinstance(x, list)
+        if x_is_list != isinstance(y, list):
+            return False
+        if x_is_list and len(x) != len(y):
+            return False
     return True
 
 
@@ -41,6 +42,9 @@ def copy_shape(l, value=None):
 
     :param value: value to fill the list with
     """
+    # Fast path for the usual case of a list of flat rows, like chars or colors
+    if all(isinstance(i, list) and list not in map(type, i) for i in l):
+        return [[value] * len(i) for i in l]
     r = []
     for i in l:
         if isinstance(i, list):
@@ -60,13 +64,12 @@ def slice_nested(l, slice_pos, slice_size):
 
     :param slice_size: a 2-tuple (width, height) of slice size
     """
-    r = []
-    for y in range(slice_pos[1], slice_pos[1] + slice_size[1]):
-        line = []
-        for x in range(slice_pos[0], slice_pos[0] + slice_size[0]):
-            line.append(l[y][x])
-        r.append(line)
-    return r
+    if slice_pos[0] + slice_size[0] > len(l[0]) or \
+            slice_pos[1] + slice_size[1] > len(l):
+        raise ValueError('Cannot slice the list beyond its size')
+    right = slice_pos[0] + slice_size[0]
+    return [row[slice_pos[0]:right]
+            for row in l[slice_pos[1]:slice_pos[1] + slice_size[1]]]
 
 
 def rotate_list(l):
@@ -77,13 +80,48 @@ def rotate_list(l):
     """
     # Without loss of generality, presume list is row-first and we need it
     # column-first
-    r = [[None for x in range(len(l))] for x in range(len(l[0]))]
-    for row_index, row in enumerate(l):
-        for column_index, column_value in enumerate(row):
-            r[column_index][row_index] = column_value
-    return r
+    return [list(column) for column in zip(*l)]
     
 
+def color_runs(chars, colors, default_color=None):
+    """
+    Split chars into horizontal runs of the same color.
+
+    Walks ``chars`` and ``colors`` row by row in a single pass. ``None``
+    colors are treated as a continuation of whatever color was in use before
+    (starting with ``default_color``), the same way they are drawn by
+    ``BearTerminal``.
+
+    :param chars: a 2-nested list of chars
+
+    :param colors: a 2-nested list of colors, the same shape as ``chars``
+
+    :param default_color: the color in use before the first cell
+
+    :yields: (x, y, color, chars_slice) tuples, where (x, y) is the first cell of the run and ``chars_slice`` is a list of its chars
+    """
+    running_color = default_color
+    for y, (char_row, color_row) in enumerate(zip(chars, colors)):
+        if color_row and color_row[0]:
+            running_color = color_row[0]
+        # Uniformly colored rows (eg in Labels) are detected by C-level
+        # counting, without looping over the cells in Python
+        if color_row.count(running_color) + color_row.count(None) \
+                == len(color_row):
+            if char_row:
+                yield 0, y, running_color, char_row
+            continue
+        run_start = 0
+        for x, color in enumerate(color_row):
+            if color and color != running_color:
+                if x > run_start:
+                    yield run_start, y, running_color, char_row[run_start:x]
+                running_color = color
+                run_start = x
+        if run_start < len(char_row):
+            yield run_start, y, running_color, char_row[run_start:]
+
+
 def rectangles_collide(pos1, size1, pos2, size2):
     """
     Return True if the rectangles collide
@@ -99,12 +137,9 @@ def rectangles_collide(pos1, size1, pos2, size2):
 
     :param size2: size of the second rectangle, as (width, height) 2-tuple
     """
-    # X overlap
-    if pos1[0] <= pos2[0]+size2[0]-1 and pos2[0] <= pos1[0]+size1[0]-1:
-        # Y overlap
-        if pos1[1] <= pos2[1]+size2[1]-1 and pos2[1] <= pos1[1]+size1[1]-1:
-            return True
-    return False
+    # X overlap, then Y overlap
+    return pos1[0] < pos2[0] + size2[0] and pos2[0] < pos1[0] + size1[0] \
+        and pos1[1] < pos2[1] + size2[1] and pos2[1] < pos1[1] + size1[1]
 
 
 def has_values(l):
@@ -115,11 +150,7 @@ def has_values(l):
 
     :return:
     """
-    for row in l:
-        for value in row:
-            if value:
-                return True
-    return False
+    return any(map(any, l))
 
 
 def blit(l1, l2, x, y):
@@ -128,7 +159,8 @@ def blit(l1, l2, x, y):
 
     This method does not actually affect ``l1``; instead, it copies it to a new
     variable, sets whatever values need to be set, and returns the modified
-    copy.
+    copy. Only the rows are copied, not the values, which are expected to be
+    immutable (chars and colors).
 
     :param l1: A 2-nested list.
 
@@ -137,13 +169,38 @@ def blit(l1, l2, x, y):
     :param x, y: A top left corner of ``l2`` relative to ``l1``.
     :return:
     """
+    r = [row[:] for row in l1]
+    blit_inplace(r, l2, x, y)
+    return r
+
+
+def blit_inplace(l1, l2, x, y):
+    """
+    Blits ``l2`` to ``l1`` at a given pos, overwriting the original values.
+
+    Unlike ``blit``, this function changes ``l1`` itself and does not copy
+    anything. It is meant for callers that own ``l1``, for example a freshly
+    built buffer.
+
+    :param l1: A 2-nested list.
+
+    :param l2: A 2-nested list.
+
+    :param x, y: A top left corner of ``l2`` relative to ``l1``.
+    """
     if x + len(l2[0]) > len(l1[0]) or y + len(l2) > len(l1):
         raise ValueError('Cannot blit the list where it won\'t fit')
-    r = deepcopy(l1)
-    for y_offset in range(len(l2)):
-        for x_offset in range(len(l2[0])):
-            r[y+y_offset][x+x_offset] = l2[y_offset][x_offset]
-    return r
+    width = len(l2[0])
+    for y_offset, row in enumerate(l2):
+        l1[y + y_offset][x:x + width] = row[:width]
+
+
+# Box corners (top left, top right, bottom left, bottom right), horizontal and
+# vertical lines for generate_box
+_box_chars = {'single': ('\u250c', '\u2510', '\u2514', '\u2518',
+                         '\u2500', '\u2502'),
+              'double': ('\u2554', '\u2557', '\u255a', '\u255d',
+                         '\u2550', '\u2551')}
 
 
 def generate_box(size, line_width='single'):
@@ -162,32 +219,18 @@ def generate_box(size, line_width='single'):
     """
     if size[0] < 2 or size[1] < 2:
         raise BearException('Box size should be at least 2 by 2 chars')
-    chars = [[' ' for x in range(size[0])] for y in range(size[1])]
-    if line_width == 'single':
-        chars[0][0] = '\u250c'
-        chars[0][-1] = '\u2510'
-        chars[-1][0] = '\u2514'
-        chars[-1][-1] = '\u2518'
-        for x in range(len(chars[0])-2):
-            chars[0][x+1] = '\u2500'
-            chars[-1][x+1] = '\u2500'
-        for y in range(len(chars)-2):
-            chars[y+1][0] = '\u2502'
-            chars[y+1][-1] = '\u2502'
-        return chars
-    elif line_width == 'double':
-        chars[0][0] = '\u2554'
-        chars[0][-1] = '\u2557'
-        chars[-1][0] = '\u255a'
-        chars[-1][-1] = '\u255d'
-        for x in range(len(chars[0]) - 2):
-            chars[0][x + 1] = '\u2550'
-            chars[-1][x + 1] = '\u2550'
-        for y in range(len(chars) - 2):
-            chars[y + 1][0] = '\u2551'
-            chars[y + 1][-1] = '\u2551'
-        return chars
-    raise BearException('Line width should be either single or double')
+    try:
+        top_left, top_right, bottom_left, bottom_right, horizontal, vertical = \
+            _box_chars[line_width]
+    except KeyError:
+        raise BearException('Line width should be either single or double')
+    # Each row is made as a string and split into chars once
+    inner_width = size[0] - 2
+    chars = [list(top_left + horizontal * inner_width + top_right)]
+    middle = vertical + ' ' * inner_width + vertical
+    chars.extend(list(middle) for y in range(size[1] - 2))
+    chars.append(list(bottom_left + horizontal * inner_width + bottom_right))
+    return chars
 
 
 # Copypasting SO is the only correct way to program
@@ -9,7 +9,7 @@ entities are recommended.
 import inspect
 
 from bear_hug.bear_hug import BearTerminal
-from bear_hug.bear_utilities import shapes_equal, blit, copy_shape,\
+from bear_hug.bear_utilities import shapes_equal, copy_shape,\
     slice_nested, generate_box, \
     BearException, BearLayoutException, BearJSONException
 from bear_hug.event import BearEvent
@@ -170,6 +170,8 @@ class Widget:
 
     :param z_level: a Z-level to determine objects' overlap. Used by (Scrollable)ECSLayout. Not to be mixed up with a terminal layer, these are two independent systems.
     """
+    __slots__ = ('z_level', 'chars', 'colors', '_terminal', '_parent')
+
     def __init__(self, chars, colors, z_level=0):
         if not isinstance(chars, list) or not isinstance(colors, list):
             raise BearException('Chars and colors should be lists')
@@ -435,9 +437,10 @@ class Layout(Widget):
         self.child_locations[child] = pos
         child.terminal = self.terminal
         child.parent = self
-        for y in range(len(child.chars)):
-            for x in range(len(child.chars[0])):
-                self._child_pointers[pos[1] + y][pos[0] + x].append(child)
+        width = len(child.chars[0])
+        for row in self._child_pointers[pos[1]:pos[1] + len(child.chars)]:
+            for pointers in row[pos[0]:pos[0] + width]:
+                pointers.append(child)
         self.needs_redraw = True
 
     def remove_child(self, child, remove_completely=True):
@@ -454,11 +457,12 @@ class Layout(Widget):
         if child not in self.children:
             raise BearLayoutException('Layout can only remove its child')
         # process pointers
-        for y in range(len(child.chars)):
-            for x in range(len(child.chars[0])):
-                self._child_pointers[self.child_locations[child][1] + y] \
-                        [self.child_locations[child][0] + x].remove(child)
-                self.needs_redraw = True
+        x0, y0 = self.child_locations[child]
+        width = len(child.chars[0])
+        for row in self._child_pointers[y0:y0 + len(child.chars)]:
+            for pointers in row[x0:x0 + width]:
+                pointers.remove(child)
+        self.needs_redraw = True
         if remove_completely:
             del(self.child_locations[child])
             self.children.remove(child)
@@ -502,29 +506,31 @@ class Layout(Widget):
         """
         chars = copy_shape(self.chars, ' ')
         colors = copy_shape(self.colors, None)
+        child_locations = self.child_locations
+        width = len(chars[0])
         for line in range(len(chars)):
-            for char in range(len(chars[0])):
+            pointer_row = self._child_pointers[line]
+            char_row = chars[line]
+            color_row = colors[line]
+            for char in range(width):
                 highest_z = 0
                 col = None
                 c = ' '
-                for child in self._child_pointers[line][char][::]:
+                for child in pointer_row[char]:
                     # Select char and color from lowest widget (one with max y
                     # for bottom).
                     # If two widgets are equally low, pick newer one
                     if child.z_level >= highest_z:
-                        tmp_c = child.chars \
-                            [line - self.child_locations[child][1]] \
-                            [char - self.child_locations[child][0]]
+                        x0, y0 = child_locations[child]
+                        tmp_c = child.chars[line - y0][char - x0]
                         if c != ' ' and tmp_c in (' ', 32, None):
                             continue
                         else:
                             highest_z = child.z_level
                             c = tmp_c
-                            col = child.colors \
-                                [line - self.child_locations[child][1]] \
-                                [char - self.child_locations[child][0]]
-                chars[line][char] = c
-                colors[line][char] = col
+                            col = child.colors[line - y0][char - x0]
+                char_row[char] = c
+                color_row[char] = col
         self.chars = chars
         self.colors = colors
     
@@ -1062,7 +1068,8 @@ class Label(Widget):
 
     :param height: text area height. Defaults to the line count in `text`
     """
-    
+    __slots__ = ('color', '_just', '_text')
+
     def __init__(self, text, chars=None, colors=None,
                  just='left', color='white', width=None, height=None, **kwargs):
         # TODO: add input delay to Label
@@ -1080,6 +1087,13 @@ class Label(Widget):
         self._just = just
         self._text = text
     
+    # Justification functions, each called as f(line, width). Unlike
+    # str.center, centering puts the odd space to the right of the line
+    _justify_functions = {'left': str.ljust,
+                          'right': str.rjust,
+                          'center': lambda line, width: line.rjust(
+                              len(line) + (width - len(line)) // 2).ljust(width)}
+
     @staticmethod
     def _generate_chars(text, width, height, just):
         """
@@ -1088,29 +1102,17 @@ class Label(Widget):
         :param just:
         :return:
         """
-        
-        def justify(line, width, just_type):
-            if len(line) < width:
-                if just_type == 'left':
-                    return line.ljust(width)
-                elif just_type == 'right':
-                    return line.rjust(width)
-                elif just_type == 'center':
-                    lj = width - int((width - len(line)) / 2)
-                    return line.ljust(lj).rjust(width)
-                else:
-                    raise BearException(
-                        'Justification should be \'left\', \'right\' or \'center\'')
-            else:
-                return line
-        
+        try:
+            justify = Label._justify_functions[just]
+        except KeyError:
+            raise BearException(
+                'Justification should be \'left\', \'right\' or \'center\'')
         lines = text.split('\n')
         if not width:
             width = max(len(x) for x in lines)
-        r = [list(justify(x, width, just)) for x in lines]
+        r = [list(justify(x, width)) for x in lines]
         if height and len(r) < height:
-            for x in range(height - len(r)):
-                r.append([' ' for j in range(len(r[0]))])
+            r.extend(list(' ' * width) for x in range(height - len(r)))
         return r
 
     @property
@@ -1127,16 +1129,13 @@ class Label(Widget):
             raise ValueError('Text doesn\'t fit in a Label')
         if not self._text:
             self._text = value
-        chars = copy_shape(self.chars, ' ')
-        self.chars = blit(chars, self._generate_chars(value,
-                                                      len(self.chars[0]),
-                                                      len(self.chars),
-                                                      self.just),
-                          0, 0)
+        # Text is known to fit, so the generated chars are exactly Label-sized
+        self.chars = self._generate_chars(value, len(self.chars[0]),
+                                          len(self.chars), self.just)
         self._text = value
         # MousePosWidgets (a child of Label) may have self.terminal set
         # despite not being connected to the terminal directly
-        if self.terminal and self in self.terminal._widget_pointers:
+        if self.terminal and self in self.terminal.widget_locations:
             self.terminal.update_widget(self)
 
     @property
@@ -8,9 +8,57 @@ def test_shapes():
     l2 = copy_shape(l, None)
     assert l2 == [[None, None], [None, None], [None, None, None]]
     assert shapes_equal(l, l2)
+    assert not shapes_equal(l, l2[:2])
+    assert not shapes_equal([[1, 1], [2, 2]], [[1, 1], 2])
 
 
 def test_collision():
     assert rectangles_collide((5, 5), (2, 2), (5, 6), (1, 1))
     assert rectangles_collide((5, 5), (2, 2), (1, 1), (5, 10))
     assert not rectangles_collide((5, 5), (1, 1), (6, 6), (1, 1))
+
+
+def test_color_runs():
+    chars = [['a', 'b', 'c'], ['d', 'e', 'f']]
+    colors = [['red', None, 'blue'], [None, 'blue', 'red']]
+    assert list(color_runs(chars, colors, 'white')) == \
+        [(0, 0, 'red', ['a', 'b']), (2, 0, 'blue', ['c']),
+         (0, 1, 'blue', ['d', 'e']), (2, 1, 'red', ['f'])]
+    uniform = [['red', None, 'red'], [None, None, None]]
+    assert list(color_runs(chars, uniform, 'white')) == \
+        [(0, 0, 'red', ['a', 'b', 'c']), (0, 1, 'red', ['d', 'e', 'f'])]
+
+
+def test_blit():
+    l1 = [[0, 0, 0], [0, 0, 0], [0, 0, 0]]
+    l2 = [[1, 2], [3, 4]]
+    assert blit(l1, l2, 1, 1) == [[0, 0, 0], [0, 1, 2], [0, 3, 4]]
+    # The original list is not changed
+    assert l1 == [[0, 0, 0], [0, 0, 0], [0, 0, 0]]
+    blit_inplace(l1, l2, 0, 0)
+    assert l1 == [[1, 2, 0], [3, 4, 0], [0, 0, 0]]
+
+
+def test_rotate():
+    l = [[1, 2, 3], [4, 5, 6]]
+    assert rotate_list(l) == [[1, 4], [2, 5], [3, 6]]
+    assert rotate_list(rotate_list(l)) == l
+
+
+def test_slice_and_values():
+    l = [[0, 1, 2], [3, 4, 5], [6, 7, 8]]
+    assert slice_nested(l, (1, 1), (2, 2)) == [[4, 5], [7, 8]]
+    assert has_values(l)
+    assert not has_values([[0, None], ['', 0]])
+
+
+def test_generate_box():
+    box = generate_box((4, 3))
+    assert [''.join(row) for row in box] == \
+        ['┌──┐', '│  │', '└──┘']
+    # Rows are independent lists
+    box = generate_box((4, 4))
+    box[1][1] = 'x'
+    assert box[2][1] == ' '
+    assert generate_box((2, 2), 'double') == [['╔', '╗'],
+                                              ['╚', '╝']]